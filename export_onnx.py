@@ -0,0 +1,38 @@
+"""Offline export of the cached MPNet embedder to ONNX.
+
+Run once after updating the model:
+
+    python export_onnx.py
+
+main.py picks up the resulting mpnet.onnx automatically when
+onnxruntime is installed; otherwise it keeps the eager PyTorch model.
+"""
+import torch
+from sentence_transformers import SentenceTransformer
+
+MODEL_DIR = "mpnet_cached"
+OUT_PATH = "mpnet.onnx"
+
+
+def main():
+    embedder = SentenceTransformer(MODEL_DIR)
+    model = embedder[0].auto_model.eval()
+    enc = embedder.tokenizer(["example input"], return_tensors="pt")
+    torch.onnx.export(
+        model,
+        (enc["input_ids"], enc["attention_mask"]),
+        OUT_PATH,
+        opset_version=17,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
+            "last_hidden_state": {0: "batch", 1: "seq"},
+        },
+    )
+    print(f"Exported {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # pip install transformers datasets seqeval scikit-learn
 
+import os
+
+import torch
 from datasets import Dataset
 from transformers import BertTokenizerFast
 
@@ -16,7 +19,7 @@ examples = [
 # Convert to Hugging Face Dataset
 dataset = Dataset.from_list(examples)
 
-from transformers import BertForTokenClassification, Trainer, TrainingArguments
+from transformers import BertForTokenClassification, DataCollatorForTokenClassification, Trainer, TrainingArguments
 
 label_list = ["O", "B-TENOR", "B-CURRENCY", "B-IPT"]
 id2label = {i: label for i, label in enumerate(label_list)}
@@ -24,11 +27,41 @@ label2id = {label: i for i, label in enumerate(label_list)}
 
 model = BertForTokenClassification.from_pretrained("bert-base-uncased", num_labels=len(label_list), id2label=id2label, label2id=label2id)
 
+# Tokenize once up front (batched + parallel) instead of per-example inside
+# the training loop, aligning labels to the first sub-token of each word.
+def tokenize_and_align(examples):
+    enc = tokenizer(examples["tokens"], is_split_into_words=True, truncation=True)
+    all_labels = []
+    for i, labels in enumerate(examples["labels"]):
+        word_ids = enc.word_ids(batch_index=i)
+        previous = None
+        label_ids = []
+        for word_id in word_ids:
+            if word_id is None or word_id == previous:
+                label_ids.append(-100)  # special tokens / continuation sub-tokens
+            else:
+                label_ids.append(label2id[labels[word_id]])
+            previous = word_id
+        all_labels.append(label_ids)
+    enc["labels"] = all_labels
+    return enc
+
+dataset = dataset.map(tokenize_and_align, batched=True, num_proc=os.cpu_count(), remove_columns=["tokens"])
+
+# Pad to a multiple of 8 so batches line up with Tensor Core tile sizes
+data_collator = DataCollatorForTokenClassification(tokenizer, pad_to_multiple_of=8)
+
+# fp16 halves the bytes moved per step and lights up Tensor Cores; the
+# fused AdamW and background dataloader workers only pay off on GPU too.
 training_args = TrainingArguments(
     output_dir="./parser_model",
-    evaluation_strategy="no",
-    per_device_train_batch_size=8,
+    eval_strategy="no",
+    per_device_train_batch_size=16,
+    gradient_accumulation_steps=1,
     num_train_epochs=5,
+    fp16=torch.cuda.is_available(),
+    dataloader_num_workers=4 if torch.cuda.is_available() else 0,
+    optim="adamw_torch_fused" if torch.cuda.is_available() else "adamw_torch",
     logging_steps=10
 )
 
@@ -36,20 +69,27 @@ trainer = Trainer(
     model=model,
     args=training_args,
     train_dataset=dataset,
-    tokenizer=tokenizer
+    processing_class=tokenizer,
+    data_collator=data_collator
 )
 
 trainer.train()
 # Save the model and tokenizer
 
+# Quantize the trained model to int8 for inference: BERT inference is
+# memory-bandwidth-bound on the Linear weights, so int8 quarters the bytes
+# fetched vs FP32 with negligible F1 loss for token tagging.
+model_q = torch.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
 text = "10yr (GBP) @ MS+165bps area"
 tokens = tokenizer.tokenize(text)
 inputs = tokenizer(text, return_tensors="pt")
-outputs = model(**inputs).logits.argmax(-1)
+outputs = model_q(**inputs).logits.argmax(-1)
 labels = [id2label[i] for i in outputs[0].tolist()]
 print(list(zip(tokens, labels)))
 trainer.save_model("./parser_model")
 tokenizer.save_pretrained("./parser_model")
+torch.save(model_q.state_dict(), "./parser_model/int8.pt")
 # The model and tokenizer are saved to the specified directory.
 # The model can now be loaded later for inference or further training.
 # The code above trains a BERT model for token classification on a custom dataset.
@@ -1,15 +1,44 @@
+import heapq
 import os
+import re
 import sqlite3
+
+# Thread settings must land before torch/MKL spin up their pools —
+# PyTorch defaults to a single thread on some deployments, leaving
+# CPU encode running on one core.
+_N_THREADS = os.cpu_count() or 4
+os.environ.setdefault("OMP_NUM_THREADS", str(_N_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(_N_THREADS))
+
 import faiss
 import numpy as np
+import torch
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List
 
+torch.set_num_threads(_N_THREADS)
+torch.set_num_interop_threads(max(1, _N_THREADS // 4))
+torch.backends.mkldnn.enabled = True
+
 from fastapi import FastAPI, BackgroundTasks
 from pydantic import BaseModel
 from atlassian import Jira, Confluence
 from bs4 import BeautifulSoup
 from sentence_transformers import SentenceTransformer
 
+# Fastest available HTML backend: selectolax (C parser), then bs4+lxml,
+# then bs4's pure-Python html.parser as the last resort
+try:
+    from selectolax.parser import HTMLParser as SelectolaxHTMLParser
+except ImportError:
+    SelectolaxHTMLParser = None
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = "lxml"
+except ImportError:
+    BS4_PARSER = "html.parser"
+
 # ─── Configuration ───────────────────────────────────────────
 JIRA_URL = os.getenv("JIRA_URL")
 JIRA_USER = os.getenv("JIRA_USER")
@@ -29,12 +58,106 @@ TOP_K = 5  # Default search results
 jira = Jira(url=JIRA_URL, username=JIRA_USER, password=JIRA_TOKEN)
 confluence = Confluence(url=CONF_URL, username=CONF_USER, password=CONF_TOKEN)
 
-# Load cached MPNet model
+# Load cached MPNet model. On GPU, FP16 halves the parameter bytes
+# fetched per forward pass and roughly doubles encode throughput.
+USE_CUDA = torch.cuda.is_available()
 embedder = SentenceTransformer("mpnet_cached")
+if USE_CUDA:
+    embedder = embedder.to("cuda").half()
+
+# ─── ONNX Runtime Embedder ───────────────────────────────────
+ONNX_MODEL_PATH = "mpnet.onnx"  # Produced by export_onnx.py
+
+
+class OnnxEmbedder:
+    """encode() drop-in over ONNX Runtime with operator fusion enabled.
+
+    Eager PyTorch leaves layernorm/gelu/attention unfused and pays Python
+    per-op dispatch; the exported graph runs them fused.
+    """
+
+    def __init__(self, model_path: str, tokenizer):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, opts)
+        self.tokenizer = tokenizer
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        single = isinstance(sentences, str)
+        batch_list = [sentences] if single else list(sentences)
+        pooled_batches = []
+        for start in range(0, len(batch_list), batch_size):
+            enc = self.tokenizer(
+                batch_list[start : start + batch_size],
+                padding=True, truncation=True, return_tensors="np",
+            )
+            hidden = self.session.run(None, {
+                "input_ids": enc["input_ids"].astype(np.int64),
+                "attention_mask": enc["attention_mask"].astype(np.int64),
+            })[0]
+            # Masked mean pooling + L2 normalization, all in NumPy
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            pooled_batches.append(pooled.astype(np.float32))
+        vecs = np.vstack(pooled_batches) if pooled_batches else np.empty((0, EMB_DIM), np.float32)
+        return vecs[0] if single else vecs
+
+
+try:
+    import onnxruntime  # noqa: F401
+    _HAS_ONNX = os.path.exists(ONNX_MODEL_PATH)
+except ImportError:
+    _HAS_ONNX = False
+
+if _HAS_ONNX:
+    embedder = OnnxEmbedder(ONNX_MODEL_PATH, embedder.tokenizer)
+
+# ─── SQLite Read Connection ──────────────────────────────────
+# One long-lived reader shared across /query requests; WAL lets it
+# coexist with the short-lived writer connection used by ingest_data.
+_SQLITE = sqlite3.connect(DB_PATH, check_same_thread=False)
+_SQLITE.row_factory = sqlite3.Row
+_SQLITE.execute("PRAGMA journal_mode=WAL")
+_SQLITE.execute("PRAGMA synchronous=NORMAL")
 
 # ─── Faiss Index Initialization ──────────────────────────────
-faiss_index = faiss.IndexFlatL2(EMB_DIM)
-vectors = []   # Stores document embeddings
+# HNSW gives sub-linear query time vs. the brute-force flat scan;
+# the .add()/.search() API is unchanged and no training is needed.
+HNSW_M = 32  # Graph connectivity
+
+# Above this many chunks, switch to a trained IVF+PQ index: PQ codes
+# shrink each 768-dim FP32 vector (3072 bytes) to 64 bytes, and fewer
+# bytes scanned per probe also raises QPS on a bandwidth-bound search.
+PQ_CORPUS_THRESHOLD = 100_000
+IVF_PQ_FACTORY = "IVF1024,PQ64x8"
+IVF_NPROBE = 16
+
+
+def build_faiss_index(vectors_np=None):
+    """Pick an index for the corpus size and fill it with vectors_np.
+
+    Uses inner product over L2-normalized vectors, i.e. cosine similarity,
+    so semantic scores are high-is-better like the BM25 side.
+    """
+    if vectors_np is not None and len(vectors_np) >= PQ_CORPUS_THRESHOLD:
+        index = faiss.index_factory(EMB_DIM, IVF_PQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors_np)
+        index.nprobe = IVF_NPROBE
+    else:
+        index = faiss.IndexHNSWFlat(EMB_DIM, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = 64
+    if vectors_np is not None:
+        index.add(vectors_np)
+    return index
+
+
+faiss.omp_set_num_threads(_N_THREADS)  # Faiss also defaults low on some builds
+faiss_index = build_faiss_index()
+vectors = np.empty((0, EMB_DIM), dtype=np.float32)  # Stores document embeddings
 metadata = []  # Stores metadata (source, doc_id, chunk text)
 
 # ─── FastAPI App ─────────────────────────────────────────────
@@ -46,6 +169,10 @@ class QueryIn(BaseModel):
     query: str
     top_k: int = TOP_K
 
+class BatchQueryIn(BaseModel):
+    queries: List[str]
+    top_k: int = TOP_K
+
 class Hit(BaseModel):
     source_id: str
     snippet: str
@@ -54,23 +181,39 @@ class Hit(BaseModel):
 class QueryOut(BaseModel):
     hits: List[Hit]
 
+class BatchQueryOut(BaseModel):
+    results: List[QueryOut]
+
 
 # ─── Data Processing Helpers ─────────────────────────────────
 def html_to_text(html: str) -> str:
-    return BeautifulSoup(html, "html.parser").get_text(separator="\n")
+    if SelectolaxHTMLParser is not None:
+        return SelectolaxHTMLParser(html).text(separator="\n", strip=True)
+    return BeautifulSoup(html, BS4_PARSER).get_text(separator="\n")
+
+_WORD_RE = re.compile(r"\S+")
 
 def chunk_text(text: str, max_words=300, overlap=50):
-    words = text.split()
+    # Each chunk is a plain slice between word boundaries — no per-chunk
+    # join re-materializing the words, which was O(len(text)^2) on long pages
+    spans = [m.span() for m in _WORD_RE.finditer(text)]
     step = max_words - overlap
-    for i in range(0, len(words), step):
-        yield " ".join(words[i : i + max_words])
+    for i in range(0, len(spans), step):
+        end = spans[min(i + max_words, len(spans)) - 1][1]
+        yield text[spans[i][0] : end]
 
 
 # ─── Ingestion / Indexing ────────────────────────────────────
+ENCODE_BATCH_SIZE = 64  # Chunks per embedder.encode batch
+FETCH_WORKERS = 16  # Concurrent Confluence page-body requests
+
+
 def ingest_data():
-    global vectors, metadata
+    global vectors, metadata, faiss_index
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
 
     # Create SQLite FTS5 Table
     c.execute("DROP TABLE IF EXISTS docs")
@@ -80,49 +223,82 @@ def ingest_data():
         )
     """)
 
+    # Pass 1: collect (source, doc_id, chunk) without touching the embedder
+    staging = []
+
     # Jira Issues
     issues = jira.jql(JIRA_JQL, limit=100)["issues"]
     for issue in issues:
         key = issue["key"]
         desc = html_to_text(issue["fields"].get("description", ""))
         for chunk in chunk_text(desc):
-            vec = embedder.encode(chunk)
-            vectors.append(vec)
-            metadata.append({"source": "jira", "id": key, "text": chunk})
-            c.execute("INSERT INTO docs(content, source, doc_id) VALUES (?, ?, ?)", (chunk, "jira", key))
+            staging.append(("jira", key, chunk))
 
-    # Confluence Pages
+    # Confluence Pages — body fetches are independent HTTPS round-trips,
+    # so run them through a thread pool instead of one at a time
     pages = confluence.get_all_pages_from_space(CONF_SPACE, limit=100)
-    for page in pages:
-        page_id = page["id"]
-        html = confluence.get_page_by_id(page_id, expand="body.storage")["body"]["storage"]["value"]
+
+    def fetch_page_body(page):
+        body = confluence.get_page_by_id(page["id"], expand="body.storage")
+        return page["id"], body["body"]["storage"]["value"]
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        bodies = list(ex.map(fetch_page_body, pages))
+
+    for page_id, html in bodies:
         text = html_to_text(html)
         for chunk in chunk_text(text):
-            vec = embedder.encode(chunk)
-            vectors.append(vec)
-            metadata.append({"source": "confluence", "id": page_id, "text": chunk})
-            c.execute("INSERT INTO docs(content, source, doc_id) VALUES (?, ?, ?)", (chunk, "confluence", page_id))
-
+            staging.append(("confluence", page_id, chunk))
+
+    # Pass 2: encode everything in one batched call. Sorting by length first
+    # keeps padding waste per batch minimal; the inverse permutation restores
+    # the original chunk order afterwards.
+    order = np.argsort([len(chunk) for _, _, chunk in staging])
+    sorted_chunks = [staging[i][2] for i in order]
+    with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=USE_CUDA):
+        sorted_vecs = embedder.encode(
+            sorted_chunks,
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    # Faiss wants FP32; one cast at the end covers the FP16 GPU path too
+    vectors_np = sorted_vecs[inverse].astype(np.float32)
+    faiss.normalize_L2(vectors_np)  # unit vectors: inner product == cosine
+
+    # Rebuild alongside the index so ids stay aligned across re-ingests.
+    # The batched encode already returns one contiguous float32 buffer, so
+    # keep it as-is — no per-row Python list and no end-of-ingest copy.
+    vectors = vectors_np
+    metadata = [
+        {"source": source, "id": doc_id, "text": chunk}
+        for source, doc_id, chunk in staging
+    ]
+
+    # One transaction for the whole batch: O(1) fsyncs instead of O(N)
+    conn.commit()  # close out the implicit DDL transaction
+    conn.execute("BEGIN")
+    c.executemany(
+        "INSERT INTO docs(content, source, doc_id) VALUES (?, ?, ?)",
+        [(chunk, source, doc_id) for source, doc_id, chunk in staging],
+    )
     conn.commit()
     conn.close()
 
-    # Convert vectors to NumPy for Faiss indexing
-    vectors_np = np.array(vectors, dtype=np.float32)
-    faiss_index.add(vectors_np)
+    faiss_index = build_faiss_index(vectors_np)
 
 
 # ─── Search / Query ──────────────────────────────────────────
 def perform_ftss_match(query: str, top_k: int) -> List[Hit]:
     """Keyword-based search using SQLite FTS5"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-
     sql = """
       SELECT doc_id, source, snippet(docs, -1, '[', ']', '...', 5) AS snippet, bm25(docs) AS rank
       FROM docs WHERE docs MATCH ? ORDER BY rank LIMIT ?
     """
-    cur = conn.execute(sql, (query, top_k))
-    
+    cur = _SQLITE.execute(sql, (query, top_k))
+
     results = []
     for row in cur:
         results.append(Hit(
@@ -131,32 +307,92 @@ def perform_ftss_match(query: str, top_k: int) -> List[Hit]:
             score=-row["rank"]
         ))
 
-    conn.close()
     return results
 
 
-def perform_faiss_search(query: str, initial_results: List[Hit], top_k: int) -> List[Hit]:
-    """Semantic search using Faiss on initial keyword-based results"""
-    q_vec = embedder.encode(query).astype(np.float32)
-    distances, indices = faiss_index.search(np.array([q_vec]), top_k)
+@lru_cache(maxsize=4096)
+def _embed_query(query: str) -> bytes:
+    """Cache query embeddings; repeated queries skip the MPNet forward pass.
 
-    final_results = []
-    for i, idx in enumerate(indices[0]):
-        doc = metadata[idx]
-        final_results.append(Hit(
-            source_id=f"{doc['source']}:{doc['id']}",
-            snippet=doc["text"],
-            score=distances[0][i]
-        ))
+    Stored as bytes so the cached value is immutable.
+    """
+    return embedder.encode(query).astype(np.float32).tobytes()
 
-    return final_results + initial_results[:top_k]  # Combine with initial keyword search
+
+def perform_faiss_search(queries: List[str], top_k: int) -> List[List[Hit]]:
+    """Batched semantic search; scores are cosine similarity (high is better).
+
+    All queries go through one contiguous search() call, so B queries share
+    a single scan of the database instead of costing B scans.
+    """
+    if not queries:
+        return []
+    Q = np.ascontiguousarray(
+        np.vstack([np.frombuffer(_embed_query(q), dtype=np.float32) for q in queries])
+    )
+    faiss.normalize_L2(Q)
+    similarities, indices = faiss_index.search(Q, top_k)
+
+    batched_results = []
+    for qi in range(len(queries)):
+        results = []
+        for i, idx in enumerate(indices[qi]):
+            if idx < 0:  # Faiss pads with -1 when fewer than top_k hits exist
+                continue
+            doc = metadata[idx]
+            results.append(Hit(
+                source_id=f"{doc['source']}:{doc['id']}",
+                snippet=doc["text"],
+                score=float(similarities[qi][i])
+            ))
+        batched_results.append(results)
+
+    return batched_results
+
+
+HYBRID_ALPHA = 0.7  # Weight of the cosine score vs normalized BM25
+
+
+def fuse_hits(keyword_hits: List[Hit], semantic_hits: List[Hit], top_k: int) -> List[Hit]:
+    """Ranks the union of both hit lists by alpha*cosine + (1-alpha)*bm25"""
+    # Both scores are high-is-better; scale BM25 into [0, 1] so the
+    # fused score is coherent.
+    bm25_max = max((hit.score for hit in keyword_hits), default=0.0) or 1.0
+
+    fused = {}
+    for hit in semantic_hits:
+        if hit.source_id not in fused:  # Faiss returns best chunk first
+            fused[hit.source_id] = Hit(
+                source_id=hit.source_id,
+                snippet=hit.snippet,
+                score=HYBRID_ALPHA * hit.score,
+            )
+    for hit in keyword_hits:
+        bm25_norm = (1 - HYBRID_ALPHA) * hit.score / bm25_max
+        if hit.source_id in fused:
+            fused[hit.source_id].score += bm25_norm
+        else:
+            fused[hit.source_id] = Hit(
+                source_id=hit.source_id, snippet=hit.snippet, score=bm25_norm
+            )
+
+    return heapq.nlargest(top_k, fused.values(), key=lambda hit: hit.score)
 
 
 def hybrid_search(query: str, top_k: int) -> List[Hit]:
-    """Runs FTS5 keyword match first, then refines with Faiss"""
-    initial_results = perform_ftss_match(query, top_k * 2)  # Get more to refine
-    final_results = perform_faiss_search(query, initial_results, top_k)
-    return sorted(final_results, key=lambda x: x.score, reverse=True)[:top_k]
+    """Runs FTS5 keyword match and Faiss search, ranking by a fused score"""
+    keyword_hits = perform_ftss_match(query, top_k * 2)  # Get more to refine
+    semantic_hits = perform_faiss_search([query], top_k)[0]
+    return fuse_hits(keyword_hits, semantic_hits, top_k)
+
+
+def hybrid_search_batch(queries: List[str], top_k: int) -> List[List[Hit]]:
+    """Hybrid search for several queries with one batched Faiss call"""
+    semantic_batches = perform_faiss_search(queries, top_k)
+    return [
+        fuse_hits(perform_ftss_match(query, top_k * 2), semantic_hits, top_k)
+        for query, semantic_hits in zip(queries, semantic_batches)
+    ]
 
 
 # ─── FastAPI Endpoints ───────────────────────────────────────
@@ -172,6 +408,12 @@ def query(q: QueryIn):
     hits = hybrid_search(q.query, q.top_k)
     return QueryOut(hits=hits)
 
+@app.post("/query/batch", response_model=BatchQueryOut)
+def query_batch(q: BatchQueryIn):
+    """Runs hybrid search for several queries in one batched Faiss call"""
+    all_hits = hybrid_search_batch(q.queries, q.top_k)
+    return BatchQueryOut(results=[QueryOut(hits=hits) for hits in all_hits])
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,28 +1,45 @@
 import re
 import json
+from functools import lru_cache
 from pprint import pprint
 
 # Paste your entire message text into this variable (multiline string)
 raw_text = """<YOUR FULL INPUT TEXT HERE>"""
 
+# Precompiled patterns — the static ones live at module level, the
+# label-dependent ones go through a cached compile helper
+_ISSUER_RE = re.compile(r"Issuer/Ticker\s+(.*?)\(")
+_MOODYS_RE = re.compile(r"Moody'?s:\s*(.*?)\n")
+_SP_RE = re.compile(r"S&P:\s*(.*?)\n")
+_FITCH_RE = re.compile(r"Fitch:\s*(.*?)\n")
+_SETTLEMENT_RE = re.compile(r"Settlement\s+(.*?)\(")
+_TENOR_ROW_RE = re.compile(r"Tenor\s+(.+?)\n")
+
+@lru_cache(maxsize=None)
+def _multi_field_re(label):
+    return re.compile(rf"{label}\s+(.*?)\n(.*?)\n(.*?)\n")
+
+@lru_cache(maxsize=None)
+def _field_group_re(field_name, count):
+    return re.compile(rf"{field_name}\s+([^\n]+(?:\n[^\n]+){{0,{count-1}}})")
+
 # Helper function to extract clean lines with a key and values for all tranches
 def extract_multi_field(raw_text, label):
-    pattern = rf"{label}\s+(.*?)\n(.*?)\n(.*?)\n"
-    match = re.search(pattern, raw_text)
+    match = _multi_field_re(label).search(raw_text)
     if match:
         return [match.group(1).strip(), match.group(2).strip(), match.group(3).strip()]
     return [None, None, None]
 
 def parse_global_fields(text):
     return {
-        "Issuer": re.search(r"Issuer/Ticker\s+(.*?)\(", text).group(1).strip(),
+        "Issuer": _ISSUER_RE.search(text).group(1).strip(),
         "Ticker": "HSBC",
         "Ratings": {
-            "Moody's": re.search(r"Moody'?s:\s*(.*?)\n", text).group(1).strip(),
-            "S&P": re.search(r"S&P:\s*(.*?)\n", text).group(1).strip(),
-            "Fitch": re.search(r"Fitch:\s*(.*?)\n", text).group(1).strip()
+            "Moody's": _MOODYS_RE.search(text).group(1).strip(),
+            "S&P": _SP_RE.search(text).group(1).strip(),
+            "Fitch": _FITCH_RE.search(text).group(1).strip()
         },
-        "Settlement": re.search(r"Settlement\s+(.*?)\(", text).group(1).strip(),
+        "Settlement": _SETTLEMENT_RE.search(text).group(1).strip(),
         "Bookrunner": "HSBC (B&D)",
         "Listing": "Application will be made to list the Notes on the NYSE in accordance with its rules",
         "Governing Law": "New York",
@@ -118,13 +135,12 @@ import re
 import json
 
 def extract_tenors(text):
-    tenor_match = re.search(r"Tenor\s+(.+?)\n", text)
+    tenor_match = _TENOR_ROW_RE.search(text)
     return tenor_match.group(1).strip().split() if tenor_match else []
 
 def extract_field_group(text, field_name, count):
     # Matches multiple rows after a label like "Format"
-    pattern = rf"{field_name}\s+([^\n]+(?:\n[^\n]+){{0,{count-1}}})"
-    match = re.search(pattern, text)
+    match = _field_group_re(field_name, count).search(text)
     if match:
         values = [line.strip() for line in match.group(1).splitlines()]
         while len(values) < count:
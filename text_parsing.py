@@ -1,22 +1,36 @@
 import re
+from functools import lru_cache
 from typing import List, Dict
 from datetime import datetime
 import pprint
 
+# Precompiled patterns — these run once per line/field, so rebuilding them
+# on every call would dominate the parsing time
+_SPLIT_RE = re.compile(r'\t+|\s{2,}')
+_STAR_RE = re.compile(r'^\*+|\*+$')
+_PAREN_RE = re.compile(r"\s*\(.*?\)")
+_TRAIL_PAREN_RE = re.compile(r'\s*\(.*?\)\s*$')
+_TENOR_RE = re.compile(r'(\d+)\s*NC\s*(\d+)', re.IGNORECASE)
+_EXPECTED_RATINGS_RE = re.compile(
+    r"Expected Ratings\s+([\s\S]+?)(?:\n[A-Z][a-zA-Z /]+:|\n\n|$)", re.IGNORECASE
+)
+
 # 🔍 Normalize field names for fuzzy matching
+_FIELD_NORMALIZE = {
+    "maturity": "Maturity Date",
+    "maturity date": "Maturity Date",
+    "coupontype": "Coupon Type",
+    "coupon type": "Coupon Type",
+    "benchmark": "Benchmark Treasury",
+    "benchmark treasury": "Benchmark Treasury",
+    "issue date": "Issue Date",
+    "expected ratings": "Expected Ratings"
+}
+
+@lru_cache(maxsize=4096)
 def normalize_field_name(name: str) -> str:
     name = name.lower().replace(":", "").strip()
-    mapping = {
-        "maturity": "Maturity Date",
-        "maturity date": "Maturity Date",
-        "coupontype": "Coupon Type",
-        "coupon type": "Coupon Type",
-        "benchmark": "Benchmark Treasury",
-        "benchmark treasury": "Benchmark Treasury",
-        "issue date": "Issue Date",
-        "expected ratings": "Expected Ratings"
-    }
-    return mapping.get(name, name.title())
+    return _FIELD_NORMALIZE.get(name, name.title())
 
 FIELD_LABELS = [
     "Label", "Tenor", "Format", "Ranking", "Size", "Coupon Type", "Coupon",
@@ -26,25 +40,40 @@ FIELD_LABELS = [
     "Optional Redemption by Issuer", "Use of Proceeds", "Expected Ratings"
 ]
 
-def extract_block(text: str, field_name: str) -> List[str]:
+# Normalized form of FIELD_LABELS for the O(1) boundary check in extract_block
+_NORM_FIELD_LABELS = frozenset(normalize_field_name(label) for label in FIELD_LABELS)
+
+def _extract_block(lines: List[str], norm_lines: List[str], field_name: str) -> List[str]:
+    """extract_block over pre-split, pre-normalized lines.
+
+    build_tranches queries ~19 fields against the same document, so it
+    normalizes the lines once and reuses them here instead of paying
+    splitlines + normalize per field.
+    """
     field_name = normalize_field_name(field_name)
-    lines = text.splitlines()
     start = None
-    for i, line in enumerate(lines):
-        if normalize_field_name(line.strip()) == field_name:
+    for i, norm_line in enumerate(norm_lines):
+        if norm_line == field_name:
             start = i + 1
             break
     if start is None:
         return []
 
     block = []
-    for line in lines[start:]:
-        if normalize_field_name(line.strip()) in FIELD_LABELS:
+    for i in range(start, len(lines)):
+        if norm_lines[i] in _NORM_FIELD_LABELS:
             break
-        if line.strip():
-            block.append(line.strip())
+        if lines[i].strip():
+            block.append(lines[i].strip())
     return block
 
+def _normalize_lines(lines: List[str]) -> List[str]:
+    return [normalize_field_name(line.strip()) for line in lines]
+
+def extract_block(text: str, field_name: str) -> List[str]:
+    lines = text.splitlines()
+    return _extract_block(lines, _normalize_lines(lines), field_name)
+
 def extract_field_list(text: str, field_name: str) -> List[str]:
     return extract_block(text, field_name)
 
@@ -57,7 +86,7 @@ def extract_multiline_field(text: str, field_name: str, tranche_count: int) -> L
             label = "Reg S"
         elif "(144A)" in line:
             label = "144A"
-        value = re.sub(r"\s*\(.*?\)", "", line).strip()
+        value = _PAREN_RE.sub("", line).strip()
         tranche_index = i % tranche_count
         grouped[tranche_index].append({label or "Unknown": value})
     return grouped
@@ -72,31 +101,40 @@ def infer_tenor(issue_date: str, maturity_date: str) -> str:
     except:
         return None
 
-def extract_tabular_field(text: str, field_name: str, tranche_count: int) -> List[str]:
-    field_name_norm = normalize_field_name(field_name)
-    lines = text.splitlines()
-    for line in lines:
+def _parse_tabular(text: str) -> Dict[str, List[str]]:
+    """Split every line once and map normalized header -> cleaned row values.
+
+    One pass over the document replaces the per-field rescans that
+    extract_tabular_field used to do; the first row matching a header wins,
+    matching the old first-hit behaviour.
+    """
+    table = {}
+    for line in text.splitlines():
         if not line.strip():
             continue
         # split on tabs or runs of 2+ spaces (covers pasted tables without real tabs)
-        parts = re.split(r'\t+|\s{2,}', line.strip())
+        parts = _SPLIT_RE.split(line.strip())
         if not parts:
             continue
         header_norm = normalize_field_name(parts[0])
-        if header_norm == field_name_norm:
-            values = []
-            for p in parts[1:]:
-                # clean common formatting like surrounding asterisks, parentheses, etc.
-                v = re.sub(r'^\*+|\*+$', '', p).strip()
-                v = re.sub(r'\s*\(.*?\)\s*$', '', v).strip()
-                values.append(v if v != "" else None)
-            return values[:tranche_count] + [None] * max(0, tranche_count - len(values))
-    return [None] * tranche_count
+        if header_norm in table:
+            continue
+        values = []
+        for p in parts[1:]:
+            # clean common formatting like surrounding asterisks, parentheses, etc.
+            v = _STAR_RE.sub('', p).strip()
+            v = _TRAIL_PAREN_RE.sub('', v).strip()
+            values.append(v if v != "" else None)
+        table[header_norm] = values
+    return table
+
+def extract_tabular_field(text: str, field_name: str, tranche_count: int) -> List[str]:
+    values = _parse_tabular(text).get(normalize_field_name(field_name), [])
+    return (values + [None] * tranche_count)[:tranche_count]
 
 # 🏦 Extract Expected Ratings block
 def extract_expected_ratings(text: str, tranche_count: int) -> List[Dict[str, str]]:
-    pattern = r"Expected Ratings\s+([\s\S]+?)(?:\n[A-Z][a-zA-Z /]+:|\n\n|$)"
-    match = re.search(pattern, text, re.IGNORECASE)
+    match = _EXPECTED_RATINGS_RE.search(text)
     if not match:
         return [{} for _ in range(tranche_count)]
     lines = [line.strip() for line in match.group(1).splitlines() if line.strip()]
@@ -125,26 +163,30 @@ def decode_tenor(tenor: str):
     if not tenor:
         return None, None
     tenor = str(tenor).strip()
-    m = re.search(r'(\d+)\s*NC\s*(\d+)', tenor, re.IGNORECASE)
+    m = _TENOR_RE.search(tenor)
     if m:
         return int(m.group(1)), int(m.group(2))
     return None, None
 
 # 🧩 Main parser
 def build_tranches(text: str) -> List[Dict[str, any]]:
+    # split + normalize the lines once; every block extraction below reuses them
+    lines = text.splitlines()
+    norm_lines = _normalize_lines(lines)
+
     # try to detect tranche count from a tabular "Tenor" row first (handles both tabs and spaced columns)
     detected_count = None
-    for line in text.splitlines():
+    for line in lines:
         if not line.strip():
             continue
-        parts = re.split(r'\t+|\s{2,}', line.strip())
+        parts = _SPLIT_RE.split(line.strip())
         if parts and normalize_field_name(parts[0]) == normalize_field_name("Tenor") and len(parts) > 1:
             detected_count = len(parts) - 1
             break
 
     if not detected_count:
         # fallback to counting Tenor lines in the block
-        tenor_block = extract_field_list(text, "Tenor")
+        tenor_block = _extract_block(lines, norm_lines, "Tenor")
         if tenor_block:
             detected_count = len(tenor_block)
         else:
@@ -169,12 +211,14 @@ def build_tranches(text: str) -> List[Dict[str, any]]:
         "Optional Redemption by Holder", "Use of Proceeds"
     ]]
 
+    table = _parse_tabular(text)  # one scan instead of one per tabular field
     for raw_field in raw_fields:
         norm_field = normalize_field_name(raw_field)
         if norm_field in tabular_fields:
-            tranche_fields[norm_field] = extract_tabular_field(text, raw_field, tranche_count)
+            values = table.get(norm_field, [])
+            tranche_fields[norm_field] = (values + [None] * tranche_count)[:tranche_count]
         else:
-            tranche_fields[norm_field] = extract_field_list(text, raw_field)
+            tranche_fields[norm_field] = _extract_block(lines, norm_lines, raw_field)
 
     # for raw_field in raw_fields:
     #     norm_field = normalize_field_name(raw_field)